@@ -22,6 +22,9 @@ from .tailwind import generate_tailwind_config_file, handle_tailwind_build
 DJANGO_QUIK_ADDRESS = ('127.0.0.1', 8000)
 DJANGO_PROXY_PORT = 8001
 
+# Matches Django's runserver binding address such as 127.0.0.1:8000
+_BIND_RE = re.compile(r'^(\d{1,3}(?:\.\d{1,3}){3}):(\d{1,5})$')
+
 
 def run_blocking_proxy_server(configuration: Configuration):
     # Give some time to boot Django server.
@@ -47,13 +50,11 @@ def override_run_server_args() -> Tuple[str, int, int]:
     else:
         # Search for binding address and replace with different_one.
         for i in range(2, len(sys.argv)):
-            django_custom_address_pattern = r"^\d{1,3}(\.\d{1,3}){3}:\d{1,5}$"
-            match_result = re.match(django_custom_address_pattern, sys.argv[i])
+            match_result = _BIND_RE.match(sys.argv[i])
 
             if match_result:
-                bind_address = sys.argv[i]
                 # User assigned host and port for Django Quik
-                host, quik_serve_port = bind_address.split(':')
+                host, quik_serve_port = match_result.group(1), match_result.group(2)
 
                 # Swap ports so Django Quik can serve to the user assigned port.
                 if int(quik_serve_port) == int(django_serve_port):
@@ -89,6 +90,25 @@ def handle_add_arguments(settings_module: ModuleType) -> None:
     print(f'Unknown command: {sys.argv[2]}')
 
 
+def load_settings(manage_py: ModuleType) -> ModuleType:
+    """
+    Load Django settings module of the project. Exits if settings could not be loaded.
+    :param manage_py: manage.py module
+    :return: Settings module
+    """
+
+    settings_module_path = load_settings_module_path(manage_py)
+    if not settings_module_path:
+        print('Could not find django settings module. It is set in DJANGO_SETTINGS_MODULE environment variable?')
+        exit(1)
+
+    try:
+        return load_settings_module(settings_module_path)
+    except ImportError:
+        print(f'Could not load settings: {settings_module_path}')
+        exit(1)
+
+
 def handle_cli():
     """
     This function is executed from the command line and is called multiple times by Django for reloading the project.
@@ -107,29 +127,22 @@ def handle_cli():
         print("Failed to import manage.py file. Are you sure manage.py file exists?")
         exit(1)
 
-    settings_module_path = load_settings_module_path(manage_py)
-    if not settings_module_path:
-        print('Could not find django settings module. It is set in DJANGO_SETTINGS_MODULE environment variable?')
-        exit(1)
-
-    try:
-        settings_module = load_settings_module(settings_module_path)
-    except ImportError:
-        print(f'Could not load settings: {settings_module_path}')
-        exit(1)
+    command = sys.argv[1] if len(sys.argv) > 1 else None
 
     # Check if it's additional Django Quik feature.
-    if len(sys.argv) > 1:
-        if sys.argv[1] == 'init':
-            handle_add_arguments(settings_module)
-            exit(0)
+    if command == 'init':
+        handle_add_arguments(load_settings(manage_py))
+        exit(0)
 
     if hasattr(manage_py, 'main'):
-        # Modify run server arguments.
-        if len(sys.argv) > 1 and sys.argv[1] == 'runserver':
+        # Modify run server arguments. Settings are only loaded when the proxy server needs to be started, other
+        # commands are handed over to manage.py directly.
+        if command == 'runserver':
             host, django_quik_port, django_server_port = override_run_server_args()
 
             if not is_cli_running():
+                settings_module = load_settings(manage_py)
+
                 serve_address = f'http://{host}:{django_quik_port}'
                 print(f'Starting Django Quik development server at: {serve_address}')
                 print('Django Quik will proxy forward your requests to Django\'s development server.')
@@ -8,3 +8,5 @@ class Configuration:
     port: int
     proxy_port: int
     watch_dirs: List[str]
+    # Seconds to wait for more file changes before reloading pages.
+    reload_debounce_seconds: float = 0.8
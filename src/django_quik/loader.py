@@ -1,14 +1,21 @@
 import importlib
 import os
+import re
 import sys
 from pathlib import Path
-from collections import OrderedDict
 
 from types import ModuleType
 from typing import List, Optional
 
+import django
 from django.apps import apps
 
+# Directory names which are never part of the project sources and can be huge to watch.
+EXCLUDED_WATCH_DIR_NAMES = {'site-packages', 'node_modules', '.venv', 'venv', '__pycache__', '.git'}
+
+# Matches os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings') generated by startproject.
+_SETTINGS_MODULE_RE = re.compile(rb'setdefault\(\s*[\'"]DJANGO_SETTINGS_MODULE[\'"]\s*,\s*[\'"]([^\'"]+)[\'"]')
+
 
 def load_manage_py() -> ModuleType:
     """
@@ -17,12 +24,51 @@ def load_manage_py() -> ModuleType:
     :return: ModuleType
     """
 
+    # Skip the import machinery if the module is already loaded.
+    manage_py = sys.modules.get('manage')
+    if manage_py is not None:
+        return manage_py
+
     return importlib.__import__('manage')
 
 
+def parse_settings_module_path(manage_py_module: ModuleType) -> Optional[str]:
+    """
+    Find settings module path from the source of manage.py file without executing it.
+
+    :return: Settings module path
+    """
+
+    manage_py_path = getattr(manage_py_module, '__file__', None)
+    if not manage_py_path:
+        return None
+
+    try:
+        with open(manage_py_path, 'rb') as file:
+            source = file.read()
+    except OSError:
+        return None
+
+    settings_module_paths = []
+    for match_result in _SETTINGS_MODULE_RE.finditer(source):
+        # Skip matches from commented out lines.
+        line_start = source.rfind(b'\n', 0, match_result.start()) + 1
+        if source[line_start:match_result.start()].lstrip().startswith(b'#'):
+            continue
+
+        settings_module_paths.append(match_result.group(1).decode())
+
+    # Multiple candidates depend on runtime logic, so leave them to manage.py itself.
+    if len(settings_module_paths) == 1:
+        return settings_module_paths[0]
+
+    return None
+
+
 def load_settings_module_path(manage_py_module: ModuleType) -> Optional[str]:
     """
-    Load settings module by executing main function from manage.py file.
+    Load settings module path from environment variable or manage.py source. As a last resort, executes main
+    function from manage.py file.
 
     :return: ModuleType
     """
@@ -31,36 +77,44 @@ def load_settings_module_path(manage_py_module: ModuleType) -> Optional[str]:
     if settings_module_path:
         return settings_module_path
 
-    cloned_args = sys.argv.copy()
-
-    # Remove all command line arguments
-    for i in range(1, len(sys.argv)):
-        sys.argv.pop()
-
-    # Add check argument which runs main function of manage.py file and load settings path in environment variable.
-    sys.argv.append('check')
+    settings_module_path = parse_settings_module_path(manage_py_module)
+    if settings_module_path:
+        # Same as manage.py would do, so Django picks up the settings.
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module_path)
+        return settings_module_path
 
-    if hasattr(manage_py_module, 'main'):
-        manage_py_module.main()
-        settings_module_path = os.environ.get('DJANGO_SETTINGS_MODULE')
+    cloned_args = sys.argv[:]
 
-    # Pop check argument.
-    sys.argv.pop()
+    # Replace command line arguments with check argument which runs main function of manage.py file and load
+    # settings path in environment variable.
+    sys.argv[1:] = ['check']
 
-    # Put back actual arguments back.
-    for i in range(1, len(cloned_args)):
-        sys.argv.append(cloned_args[i])
+    try:
+        if hasattr(manage_py_module, 'main'):
+            manage_py_module.main()
+            settings_module_path = os.environ.get('DJANGO_SETTINGS_MODULE')
+    finally:
+        # Put back actual arguments back.
+        sys.argv[:] = cloned_args
 
     return settings_module_path
 
 
 def load_settings_module(settings_module_path: str) -> ModuleType:
     """
-    Load settings.py file form current working directory.
+    Load settings.py file form current working directory and populate Django's app registry which is required for
+    looking up app directories.
     :return: ModuleType
     """
 
-    return importlib.import_module(settings_module_path)
+    # Skip the import machinery if the module is already loaded.
+    settings_module = sys.modules.get(settings_module_path)
+    if settings_module is None:
+        settings_module = importlib.import_module(settings_module_path)
+
+    # No-op if manage.py already set up Django.
+    django.setup()
+    return settings_module
 
 
 def load_all_module_template_dirs(template_dirs: List[Path]) -> List[Path]:
@@ -73,17 +127,19 @@ def load_all_module_template_dirs(template_dirs: List[Path]) -> List[Path]:
     # Store valid template directories.
     valid_template_dirs = []
 
-    for app_dir in template_dirs:
-        # Load all installed apps path
-        for app_config in apps.get_app_configs():
-            module_path_list = app_config.module.__path__
+    # Load all installed apps path once and look up every template dir in each module path.
+    for app_config in apps.get_app_configs():
+        module_path_list = app_config.module.__path__
+
+        # Loop through module path list
+        for module_path in module_path_list:
+            base_path = Path(module_path)
 
-            # Loop through module path list
-            for module_path in module_path_list:
-                template_dir = Path(module_path).joinpath(app_dir)
+            for app_dir in template_dirs:
+                template_dir = base_path.joinpath(app_dir)
 
                 # Ignore invalid or non exising paths.
-                if template_dir.exists():
+                if os.path.isdir(template_dir):
                     valid_template_dirs.append(template_dir)
 
     return valid_template_dirs
@@ -95,36 +151,38 @@ def load_template_dirs(settings_module: ModuleType) -> List[str]:
     :return: ModuleType
     """
 
-    if not hasattr(settings_module, 'TEMPLATES'):
+    templates = getattr(settings_module, 'TEMPLATES', None)
+    if templates is None:
         return []
 
-    if type(settings_module.TEMPLATES) is not list:
+    if not isinstance(templates, list):
         print('Warn: Templates specified is not list.')
         return []
 
     template_dirs = []
+    has_installed_apps = hasattr(settings_module, 'INSTALLED_APPS')
 
     # Loop through TEMPLATES list of the settings.
-    for template in settings_module.TEMPLATES:
+    for template in templates:
         # If items of TEMPLATES is not dictionary, skip.
-        if not type(template) is dict:
+        if not isinstance(template, dict):
             print('Warn: Template specified is not dict.')
             continue
 
         # Get DIRS from TEMPLATES array.
         dirs = template.get('DIRS')
-        if type(dirs) is not list:
+        if not isinstance(dirs, list):
             continue
 
         # Add all the specified directories in the list.
         template_dirs.extend(dirs)
 
-        if template.get('APP_DIRS') and hasattr(settings_module, 'INSTALLED_APPS'):
+        if template.get('APP_DIRS') and has_installed_apps:
             app_template_dirs = load_all_module_template_dirs(dirs)
             template_dirs.extend(app_template_dirs)
 
     # Remove duplicate paths.
-    template_dirs = list(OrderedDict.fromkeys(template_dirs))
+    template_dirs = list(dict.fromkeys(template_dirs))
     return template_dirs
 
 
@@ -137,11 +195,14 @@ def load_static_files_dirs(settings_module: ModuleType) -> List[str]:
 
     static_file_dirs = []
 
-    if hasattr(settings_module, 'STATIC_ROOT'):
-        static_file_dirs.append(settings_module.STATIC_ROOT)
+    # STATIC_ROOT is commonly set to None during development.
+    static_root = getattr(settings_module, 'STATIC_ROOT', None)
+    if static_root:
+        static_file_dirs.append(static_root)
 
-    if hasattr(settings_module, 'STATICFILES_DIRS'):
-        static_file_dirs.extend(settings_module.STATICFILES_DIRS)
+    staticfiles_dirs = getattr(settings_module, 'STATICFILES_DIRS', None)
+    if staticfiles_dirs:
+        static_file_dirs.extend(staticfiles_dirs)
 
     return static_file_dirs
 
@@ -165,13 +226,36 @@ def load_dirs_to_watch(settings_module: ModuleType) -> List[str]:
     return dirs
 
 
+def is_project_dir(path: str, project_dir: str) -> bool:
+    """
+    Check if the path is inside the project directory and not inside excluded directories like virtual environments.
+    :param path: Directory path
+    :param project_dir: Real path of the project directory.
+    :return: bool
+    """
+
+    real_path = os.path.realpath(path)
+    if real_path != project_dir and not real_path.startswith(project_dir + os.sep):
+        return False
+
+    relative_parts = real_path[len(project_dir):].split(os.sep)
+    return not any(part in EXCLUDED_WATCH_DIR_NAMES for part in relative_parts)
+
+
 def load_valid_watch_dirs(settings_module: ModuleType):
     watch_dirs = []
     watch_dirs_from_settings = load_dirs_to_watch(settings_module)
+    project_dir = os.path.realpath(os.getcwd())
 
-    # Filter out non-existing directories.
+    # Filter out non-existing directories. isdir() is a single stat() call and is False for missing paths.
     for watch_dir in watch_dirs_from_settings:
-        if os.path.exists(watch_dir) and os.path.isdir(watch_dir):
-            watch_dirs.append(watch_dir)
+        if not os.path.isdir(watch_dir):
+            continue
+
+        # Recursive watches outside the project, e.g. installed packages, only add watcher load.
+        if not is_project_dir(watch_dir, project_dir):
+            continue
+
+        watch_dirs.append(watch_dir)
 
     return watch_dirs
@@ -1,16 +1,28 @@
+import os
+import queue
 import re
+import selectors
 import socket
 import threading
 import uuid
 
 from collections.abc import Callable
 from threading import Thread
-from typing import OrderedDict, List, Tuple
-
-from watchdog.events import FileSystemEventHandler, FileSystemEvent
+from typing import Tuple
+
+from watchdog.events import (
+    FileSystemEventHandler,
+    FileSystemEvent,
+    EVENT_TYPE_CREATED,
+    EVENT_TYPE_MODIFIED,
+    EVENT_TYPE_MOVED,
+    EVENT_TYPE_DELETED
+)
 from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 
 from .http import (
+    Headers,
     Stream,
     read_headers,
     parse_headers,
@@ -19,10 +31,46 @@ from .http import (
     StreamReadException,
     StreamWriteException,
     header_value,
-    read_text_body
+    read_body
 )
 from ..config import Configuration
 
+# File system events which change the content being served.
+RELOAD_EVENT_TYPES = {EVENT_TYPE_CREATED, EVENT_TYPE_MODIFIED, EVENT_TYPE_MOVED, EVENT_TYPE_DELETED}
+
+# Compiled files and editor temporary files which never require a page reload.
+IGNORED_FILE_SUFFIXES = ('.pyc', '~', '.swp')
+
+# Matches the HTML up to the last body end tag. Anchored match starts from the end of the page, where the tag
+# usually is, instead of scanning the whole page.
+BODY_END_RE = re.compile(rb'.*(</body\s*>)', re.IGNORECASE | re.DOTALL)
+
+# Matches a body end tag anywhere in the page. Used when the tag is not found near the end of the page.
+BODY_END_TAG_RE = re.compile(rb'</body\s*>', re.IGNORECASE)
+
+# Number of bytes from the end of the page searched for the body end tag before falling back to the whole page.
+BODY_END_SEARCH_SIZE = 8192
+
+# Maximum number of idle worker threads kept for handling new client connections. More workers are started while
+# all of them are busy, extra workers exit once they become idle.
+IDLE_CLIENT_WORKERS = 64
+
+# Size of the buffer reused for forwarding data when splicing is not available.
+PROXY_BUFFER_SIZE = 65536
+
+# Script injected in HTML pages to reload the page on file change events.
+RELOAD_SCRIPT_TEMPLATE = '''<script>\r
+const evtSource = new EventSource("{refresh_path}")
+           evtSource.onmessage = (event) => {
+             location.reload();
+           };
+
+           evtSource.onerror = () => {
+             location.reload();
+           }
+           </script>
+           '''
+
 
 class ThreadSafeChangeCallbacks:
     """
@@ -61,41 +109,73 @@ class ThreadSafeChangeCallbacks:
             if self.dir_change_callbacks.get(key):
                 del self.dir_change_callbacks[key]
 
-    def get_all(self) -> dict:
+    def snapshot_values(self) -> Tuple[Callable, ...]:
         """
-        Return dictionaries copy of consisting of key and callable function.
+        Return immutable snapshot of callback functions only, so the lock is not held while notifying file changes.
         :return: Callback functions.
         """
 
         with self.lock:
-            return self.dir_change_callbacks.copy()
+            return tuple(self.dir_change_callbacks.values())
 
 
 class FilesWatchEventHandler(FileSystemEventHandler):
-    def __init__(self, dir_change_callbacks: ThreadSafeChangeCallbacks, delay: int = 0.8):
+    def __init__(self, dir_change_callbacks: ThreadSafeChangeCallbacks, delay: float = 0.8):
         """
         Create new FilesWatchEventHandler instance.
 
         :param dir_change_callbacks: Instance of ThreadSafeChangeCallbacks.
-        :param delay: Delay in milliseconds to wait before broadcasting file change.
+        :param delay: Delay in seconds to wait for more changes before broadcasting file change.
         """
 
         self.dir_change_callbacks = dir_change_callbacks
         self.timer = None
+        self.timer_lock = threading.Lock()
         self.delay = delay
 
-    def on_modified(self, event: FileSystemEvent) -> None:
-        if self.timer:
-            # Timer already specified, cancel existing timer.
-            self.timer.cancel()
+    @staticmethod
+    def is_ignored_path(path) -> bool:
+        """
+        Check whether the path is a compiled or editor temporary file which never requires a page reload.
+        :param path: File path.
+        :return: True if the path should be ignored.
+        """
+
+        return os.fsdecode(path).endswith(IGNORED_FILE_SUFFIXES)
+
+    def dispatch(self, event: FileSystemEvent) -> None:
+        """
+        Drop events which can not affect the served pages before doing any timer work.
+        :param event: File system event.
+        :return: None
+        """
+
+        if event.event_type not in RELOAD_EVENT_TYPES or event.is_directory:
+            return
+
+        # Editors commonly save by writing a temporary file and moving it to the real path.
+        if self.is_ignored_path(event.src_path) and (
+                event.event_type != EVENT_TYPE_MOVED or self.is_ignored_path(event.dest_path)):
+            return
 
-        self.timer = threading.Timer(self.delay, self.trigger_notify)
-        self.timer.start()
+        super().dispatch(event)
+
+    def on_any_event(self, event: FileSystemEvent) -> None:
+        with self.timer_lock:
+            if self.timer:
+                # Timer already specified, cancel existing timer.
+                self.timer.cancel()
+
+            self.timer = threading.Timer(self.delay, self.trigger_notify)
+            self.timer.start()
 
     def trigger_notify(self) -> None:
-        for stream_id, callback in self.dir_change_callbacks.get_all().items():
-            # Invoke callback function.
-            callback()
+        for callback in self.dir_change_callbacks.snapshot_values():
+            # Invoke callback function. One failing callback should not stop notifying others.
+            try:
+                callback()
+            except Exception:
+                pass
 
 
 class WebServer:
@@ -114,21 +194,62 @@ class WebServer:
         # Unique UUID path for serving refresh text/event-stream event.
         self.refresh_path = f'/{str(uuid.uuid4())}/'
 
+        # Reloading script injected in every HTML page. Built once as it only depends on the refresh path.
+        injected_code = RELOAD_SCRIPT_TEMPLATE.replace('{refresh_path}', self.refresh_path)
+        self.injected_code_bytes = injected_code.encode()
+
         self.dir_change_callbacks = ThreadSafeChangeCallbacks(configuration)
 
+        # Queue of accepted client sockets and number of idle workers waiting for them.
+        self.clients = queue.Queue()
+        self.idle_workers = 0
+        self.workers_lock = threading.Lock()
+
+        # Keep reference of the file system observer so it lives as long as the server.
+        self.observer = None
+
         # Start file change monitor thread.
         file_change_monitor_thread = threading.Thread(target=self.listen_files_change)
         file_change_monitor_thread.daemon = True
         file_change_monitor_thread.start()
 
-    def listen_files_change(self):
-        event_handler = FilesWatchEventHandler(self.dir_change_callbacks)
-        observer = Observer()
+    def create_observer(self, observer_class: type) -> Observer:
+        event_handler = FilesWatchEventHandler(
+            self.dir_change_callbacks,
+            delay=self.configuration.reload_debounce_seconds
+        )
+        observer = observer_class()
 
         for path in self.configuration.watch_dirs:
             observer.schedule(event_handler, path, recursive=True)
 
-        observer.start()
+        return observer
+
+    def listen_files_change(self):
+        """
+        Watch file changes using native OS events. Falls back to polling when DJANGO_QUIK_POLLING=1 is set or
+        native events are unavailable, e.g. inotify watch limit is reached.
+        :return: None
+        """
+
+        use_polling = os.environ.get('DJANGO_QUIK_POLLING', '0') == '1'
+
+        if not use_polling:
+            try:
+                self.observer = self.create_observer(Observer)
+                self.observer.start()
+            except OSError as e:
+                print(f'Warn: Native file watching failed ({e}). Falling back to polling.')
+
+                # Emitters started before the failure keep their watches, release them before polling.
+                self.observer.stop()
+                use_polling = True
+
+        if use_polling:
+            self.observer = self.create_observer(PollingObserver)
+            self.observer.start()
+
+        self.observer.join()
 
     def listen(self):
         # Create new server socket, bind in specified address and listen for incoming requests.
@@ -136,14 +257,48 @@ class WebServer:
         server.listen()
 
         while True:
-            # Accept incoming TCP connection.
+            # Accept incoming TCP connection and hand over to the worker threads.
             client, _ = server.accept()
+            self.submit_client(client)
+
+    def submit_client(self, client: socket.socket) -> None:
+        """
+        Hand over client connection to an idle worker thread. Starts new worker if all workers are busy, so idle
+        or long-lived connections such as websocket never block new requests.
+        :param client: Accepted client socket.
+        :return: None
+        """
 
-            # Spawn new thread for each client to run in background and continue accepting new clients.
-            thread = Thread(target=self.handle_client, args=(client,))
+        with self.workers_lock:
+            # Reserve idle worker for this client.
+            has_idle_worker = self.idle_workers > 0
+            if has_idle_worker:
+                self.idle_workers -= 1
+
+        if not has_idle_worker:
+            # Workers are daemon threads so long-lived connections never block the shutdown.
+            thread = Thread(target=self.handle_clients)
             thread.daemon = True
             thread.start()
 
+        self.clients.put(client)
+
+    def handle_clients(self) -> None:
+        """
+        Worker loop which handles client connections one after another.
+        :return: None
+        """
+
+        while True:
+            self.handle_client(self.clients.get())
+
+            with self.workers_lock:
+                # Enough workers are waiting already, exit this one.
+                if self.idle_workers >= IDLE_CLIENT_WORKERS:
+                    return
+
+                self.idle_workers += 1
+
     def handle_client(self, sock: socket.socket) -> None:
         """
         Handle request of each client connection.
@@ -151,79 +306,52 @@ class WebServer:
         :return: None
         """
 
-        stream = None
+        stream = Stream(sock)
 
         try:
-            stream = Stream(sock)
             header_bytes = read_headers(stream)
             request_info, headers = parse_headers(header_bytes)
             self.serve_page(stream, request_info, headers)
         except (StreamReadException, StreamWriteException, Exception):
             stream.close()
 
-    def inject_event_code(self, html: str) -> str:
+    def inject_event_code(self, html: bytes) -> bytes:
         """
         Inject reloading script in the HTML page.
-        :param html:
+        :param html: Raw HTML bytes.
         :return: HTML code with injected reloading script.
         """
 
-        injected_code = '<script>\r\n'
-        injected_code += f'const evtSource = new EventSource("{self.refresh_path}")'
-        injected_code += '''
-           evtSource.onmessage = (event) => {
-             location.reload();
-           };
-
-           evtSource.onerror = () => {
-             location.reload();
-           }
-           </script>
-           '''
+        # Search for the last body end tag near the end of the page first. Backtracking through the whole page is
+        # slow for fragments without a body end tag.
+        body_end_index = -1
+        tail_offset = max(0, len(html) - BODY_END_SEARCH_SIZE)
+        match_result = BODY_END_RE.match(html, tail_offset)
+        if match_result:
+            body_end_index = match_result.start(1)
+        else:
+            # Fall back to a forward scan of the whole page and keep the last body end tag.
+            for match_result in BODY_END_TAG_RE.finditer(html):
+                body_end_index = match_result.start()
 
-        # Search for body end tag and inject the reloading script.
-        if re.search(r'</body>', html, re.IGNORECASE):
-            html = re.sub(r'</body>', f'{injected_code}</body>', html, flags=re.IGNORECASE)
+        # Inject the reloading script before the last body end tag.
+        if body_end_index != -1:
+            html = html[:body_end_index] + self.injected_code_bytes + html[body_end_index:]
 
         return html
 
-    @staticmethod
-    def send_data_client_to_django_server(stream_client: Stream, stream_target: Stream) -> None:
-        """
-        Send data received from client to the Django server.
-
-        :param stream_client: Stream client instance.
-        :param stream_target: Stream target instance.
-        :return: None
+    def send_response_headers_to_client(self, stream_target: Stream, stream_client: Stream) -> bool:
         """
-
-        while True:
-            try:
-                stream_target.write_chunk(stream_client.read_chunk())
-            except (StreamReadException, StreamWriteException, OSError, Exception):
-                # If anything goes wrong, shutdown both streams.
-                stream_client.close()
-                stream_target.close()
-                return
-
-    def send_data_django_server_to_client(self, stream_target: Stream, stream_client: Stream) -> None:
-        """
-        Send data received from Django server to the client.
+        Send response headers received from Django server to the client. HTML pages are sent completely with
+        injected reloading script.
 
         :param stream_target: Stream target instance of Django Server.
         :param stream_client: Stream client instance.
-        :return: None
+        :return: True if the remaining response body should be streamed to the client.
         """
 
         # Read response headers from Django server.
-        try:
-            raw_headers = read_headers(stream_target)
-        except (StreamReadException, StreamWriteException, OSError, Exception):
-            # If anything goes wrong, shutdown both streams.
-            stream_target.close()
-            stream_client.close()
-            return
-
+        raw_headers = read_headers(stream_target)
         response_info, headers = parse_headers(raw_headers)
 
         # Extract content type from response.
@@ -232,61 +360,100 @@ class WebServer:
         # If response header is text/html, we read the whole html page and inject custom html code to
         # trigger file changes.
         if content_type and 'text/html' in content_type:
-            try:
-                # Read data from Django server.
-                response_body = read_text_body(headers, stream_target)
-                response_body = self.inject_event_code(response_body)
-                response_body_bytes = response_body.encode()
+            # Read data from Django server.
+            response_body_bytes = self.inject_event_code(read_body(headers, stream_target))
 
-                # Force connection close by the browser if Django server tries to use keep alive connection.
-                modify_headers(headers, 'Content-Length', f'{len(response_body_bytes)}')
+            # Force connection close by the browser if Django server tries to use keep alive connection.
+            modify_headers(headers, 'Content-Length', f'{len(response_body_bytes)}')
 
-                # Inject custom header for debug purpose.
-                modify_headers(headers, 'X-Proxy-Server', 'Django Quik Injected')
+            # Inject custom header for debug purpose.
+            modify_headers(headers, 'X-Proxy-Server', 'Django Quik Injected')
 
-                response_info = ('HTTP/1.0', response_info[1], response_info[2])
-                modify_headers(headers, 'Connection', 'Close')
-                header_bytes = build_header_bytes(response_info, headers)
+            response_info = ('HTTP/1.0', response_info[1], response_info[2])
+            modify_headers(headers, 'Connection', 'Close')
+            header_bytes = build_header_bytes(response_info, headers)
 
-                # Write response headers received from Django server to connected client.
-                stream_client.write_chunk(header_bytes)
+            # Write response headers received from Django server and response body to connected client at once.
+            stream_client.write_chunks((header_bytes, response_body_bytes))
+            return False
 
-                # Write response body to stream client.
-                stream_client.write_chunk(response_body_bytes)
+        upgrade_header = header_value(headers, 'Upgrade')
 
-                stream_client.close()
-                stream_target.close()
-            except (StreamReadException, StreamWriteException, OSError, Exception) as e:
-                stream_client.close()
-                stream_target.close()
+        # Except for websocket, downgrade HTTP version to HTTP/1.0.
+        if not upgrade_header or (upgrade_header and not "websocket" in upgrade_header.lower()):
+            # Downgrade HTTP Version to HTTP/1.0
+            response_info = ('HTTP/1.0', response_info[1], response_info[2])
+            modify_headers(headers, 'Connection', 'Close')
 
-        else:
-            upgrade_header = header_value(headers, 'Upgrade')
+        # Inject custom header for debug purpose.
+        modify_headers(headers, 'X-Proxy-Server', 'Django Quik Stream')
 
-            # Except for websocket, downgrade HTTP version to HTTP/1.0.
-            if not upgrade_header or (upgrade_header and not "websocket" in upgrade_header.lower()):
-                # Downgrade HTTP Version to HTTP/1.0
-                response_info = ('HTTP/1.0', response_info[1], response_info[2])
-                modify_headers(headers, 'Connection', 'Close')
+        # Body content is not modified, using existing headers without modification.
+        header_bytes = build_header_bytes(response_info, headers)
 
-            # Inject custom header for debug purpose.
-            modify_headers(headers, 'X-Proxy-Server', 'Django Quik Stream')
+        # Write response headers received from Django server to connected client. Buffered so the headers and the
+        # first body bytes go out in one write.
+        stream_client.buffer_chunk(header_bytes)
 
-            # Body content is not modified, using existing headers without modification.
-            header_bytes = build_header_bytes(response_info, headers)
+        # Body bytes read along with the headers are already buffered in the stream, selector won't notify them.
+        while stream_target.restored_bytes:
+            stream_client.buffer_chunk(stream_target.read_chunk())
+
+        stream_client.flush()
+        return True
+
+    def proxy_streams(self, stream_client: Stream, stream_proxy: Stream) -> None:
+        """
+        Forward data between client and Django server in both directions from a single thread until either side
+        disconnects.
+
+        :param stream_client: Stream client instance.
+        :param stream_proxy: Stream instance of Django server.
+        :return: None
+        """
 
-            # Write response headers received from Django server to connected client.
-            stream_client.write_chunk(header_bytes)
+        selector = selectors.DefaultSelector()
+        selector.register(stream_client.sock, selectors.EVENT_READ, (stream_client, stream_proxy))
+        selector.register(stream_proxy.sock, selectors.EVENT_READ, (stream_proxy, stream_client))
+
+        is_response_started = False
+
+        # Move bytes between sockets in kernel where supported. Otherwise, reuse single buffer for all reads.
+        pipe = os.pipe() if hasattr(os, 'splice') else None
+        buffer = None if pipe else memoryview(bytearray(PROXY_BUFFER_SIZE))
+
+        try:
+            # Request body bytes read along with the headers are already buffered in the stream.
+            while stream_client.restored_bytes:
+                stream_proxy.write_chunk(stream_client.read_chunk())
 
-            # Proxy all other content types
             while True:
-                try:
-                    stream_client.write_chunk(stream_target.read_chunk())
-                except (StreamReadException, StreamWriteException, OSError, Exception):
-                    # If anything goes wrong, shutdown both streams.
-                    stream_target.close()
-                    stream_client.close()
-                    return
+                for key, _ in selector.select():
+                    source, target = key.data
+
+                    if source is stream_proxy and not is_response_started:
+                        is_response_started = True
+                        if not self.send_response_headers_to_client(stream_proxy, stream_client):
+                            return
+
+                        continue
+
+                    if pipe:
+                        source.splice_chunk(target, pipe)
+                    else:
+                        size = source.read_into(buffer)
+                        target.write_chunk(buffer[:size])
+        except (StreamReadException, StreamWriteException, OSError, Exception):
+            # If anything goes wrong, shutdown both streams.
+            pass
+        finally:
+            if pipe:
+                os.close(pipe[0])
+                os.close(pipe[1])
+
+            selector.close()
+            stream_client.close()
+            stream_proxy.close()
 
     def serve_refresh_event_page(self, stream_client: Stream) -> None:
         """
@@ -322,7 +489,7 @@ class WebServer:
         self.dir_change_callbacks.set_callback(stream_id, file_change_callback)
 
     def serve_page(self, stream_client: Stream, request_info: Tuple[str, str, str],
-                   headers: OrderedDict[str, List[str]]) -> None:
+                   headers: Headers) -> None:
         """
         Serve one page per connection. Supports HTTP/1.0, HTTP/1.1 and WebSocket protocol.
 
@@ -346,25 +513,4 @@ class WebServer:
         stream_proxy = Stream(sock_proxy)
         stream_proxy.write_chunk(header_bytes_to_proxy)
 
-        threads = []
-        # Listen client body in new thread and send received data to django server.
-        client_to_django_server_send_thread = threading.Thread(
-            target=self.send_data_client_to_django_server,
-            args=(stream_client, stream_proxy)
-        )
-        client_to_django_server_send_thread.daemon = True
-        client_to_django_server_send_thread.start()
-        threads.append(client_to_django_server_send_thread)
-
-        # Listen django server in new thread and send data to client including header and body.
-        django_to_client_thread = threading.Thread(
-            target=self.send_data_django_server_to_client,
-            args=(stream_proxy, stream_client)
-        )
-        django_to_client_thread.daemon = True
-        django_to_client_thread.start()
-        threads.append(django_to_client_thread)
-
-        # Wait for threads to complete.
-        for thread in threads:
-            thread.join()
+        self.proxy_streams(stream_client, stream_proxy)
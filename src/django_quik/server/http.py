@@ -1,14 +1,36 @@
+import os
 import socket
 
-from copy import deepcopy
-from collections import OrderedDict
+from collections import deque
 from typing import (
+    Dict,
     List,
     Tuple,
-    Optional
+    Optional,
+    Sequence
 )
 
 
+# Double CRLF which separates headers from the body.
+HEADER_END_BYTES = b'\r\n\r\n'
+
+# Headers keyed by lowercase header name for case-insensitive lookups. Values are (header_name, values) keeping
+# the original header name for building the header bytes back. Plain dict keeps the insertion order of headers.
+Headers = Dict[str, Tuple[str, List[str]]]
+
+# Maximum size of the header block. Protects from filling up memory with endless headers.
+MAX_HEADER_SIZE = 64 * 1024
+
+# Default maximum bytes read per recv call. Large enough to read typical headers and chunks with one syscall.
+DEFAULT_BUFFER_SIZE = 65536
+
+# Buffered writes are flushed once pending bytes reach this size.
+WRITE_BUFFER_THRESHOLD = 8192
+
+# Maximum bytes moved per splice call. Matches the default pipe capacity on Linux.
+SPLICE_SIZE = 65536
+
+
 class StreamReadException(Exception):
     """
     Occurs if failed to read stream from socket.
@@ -28,7 +50,7 @@ class Stream:
     A class for reading, writing and restoring stream of bytes from socket.
     """
 
-    def __init__(self, sock: socket.socket, buffer_size=1024):
+    def __init__(self, sock: socket.socket, buffer_size=DEFAULT_BUFFER_SIZE):
         """
         Create new stream.
         :param sock: Socket
@@ -37,7 +59,23 @@ class Stream:
 
         self.sock = sock
         self.buffer_size = buffer_size
-        self.restored_bytes = b''
+
+        # Bound socket methods used on every read and write.
+        self.sock_recv = sock.recv
+        self.sock_recv_into = sock.recv_into
+        self.sock_sendall = sock.sendall
+
+        # Send small writes such as headers and server side events immediately. Not supported by non TCP sockets.
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+
+        # Bytes buffered by buffer_chunk() which are not sent yet.
+        self.pending_bytes = bytearray()
+
+        # Restored chunks in reading order. Chunks are kept as they are instead of concatenating them.
+        self.restored_bytes = deque()
 
     def read_chunk(self, buffer_size: int = None) -> bytes:
         """
@@ -46,48 +84,173 @@ class Stream:
         :return: bytes
         """
 
-        # If there are existing bytes, return all those bytes.
-        if len(self.restored_bytes) > 0:
-            restored_bytes_cloned = deepcopy(self.restored_bytes)
-
-            # Reset restored bytes.
-            self.restored_bytes = b''
-            return restored_bytes_cloned
+        # If there are restored bytes, return the oldest chunk as it is.
+        if self.restored_bytes:
+            return self.restored_bytes.popleft()
 
         # Take default buffer size or buffer size passed as argument.
-        current_buffer_size = buffer_size if buffer_size else self.buffer_size
-        data = self.sock.recv(current_buffer_size)
-        if len(data) == 0:
+        data = self.sock_recv(buffer_size or self.buffer_size)
+        if not data:
             raise StreamReadException('Stream is empty. Probably client disconnected.')
 
         return data
 
+    def read_into(self, buffer: memoryview) -> int:
+        """
+        Read bytes into the given buffer instead of allocating new bytes for each read. Restored bytes are read first.
+        :param buffer: Writable buffer
+        :return: Number of bytes read
+        """
+
+        if self.restored_bytes:
+            restored_bytes = self.restored_bytes.popleft()
+            size = min(len(buffer), len(restored_bytes))
+            buffer[:size] = restored_bytes[:size]
+
+            # Put back the part which didn't fit in the buffer.
+            if size < len(restored_bytes):
+                self.restored_bytes.appendleft(restored_bytes[size:])
+
+            return size
+
+        size = self.sock_recv_into(buffer)
+        if size == 0:
+            raise StreamReadException('Stream is empty. Probably client disconnected.')
+
+        return size
+
     def write_chunk(self, data: bytes) -> None:
         """
-        Writes all the data to socket.
+        Writes all the data to socket. Buffered bytes are sent first along with the data.
 
         :param data: bytes
         :return: None
         """
+
+        if self.pending_bytes:
+            self.pending_bytes.extend(data)
+            self.flush()
+            return
+
+        try:
+            self.sock_sendall(data)
+        except socket.error:
+            raise StreamWriteException('Writing to stream failed. Probably client disconnected.')
+
+    def buffer_chunk(self, data: bytes) -> None:
+        """
+        Buffers the data to send with the next write or flush, so multiple small writes go out in one syscall.
+        Flushes automatically once WRITE_BUFFER_THRESHOLD is reached.
+
+        :param data: bytes
+        :return: None
+        """
+
+        self.pending_bytes.extend(data)
+        if len(self.pending_bytes) >= WRITE_BUFFER_THRESHOLD:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes all the buffered bytes to socket.
+        :return: None
+        """
+
+        if not self.pending_bytes:
+            return
+
+        try:
+            self.sock_sendall(self.pending_bytes)
+        except socket.error:
+            raise StreamWriteException('Writing to stream failed. Probably client disconnected.')
+        finally:
+            self.pending_bytes.clear()
+
+    def write_chunks(self, chunks: Sequence[bytes]) -> None:
+        """
+        Writes all the chunks to socket with as few syscalls as possible without joining them. Uses scatter/gather
+        sendmsg where available.
+
+        :param chunks: Sequence of bytes
+        :return: None
+        """
+
+        if not hasattr(self.sock, 'sendmsg'):
+            self.write_chunk(b''.join(chunks))
+            return
+
+        views = [memoryview(chunk) for chunk in chunks if len(chunk) > 0]
+
+        # Buffered bytes must be sent before the chunks.
+        if self.pending_bytes:
+            views.insert(0, memoryview(bytes(self.pending_bytes)))
+            self.pending_bytes.clear()
+
         try:
-            self.sock.sendall(data)
+            while views:
+                sent_size = self.sock.sendmsg(views)
+
+                # Unlike sendall, sendmsg might send partially. Drop sent chunks and continue with the rest.
+                while views and sent_size >= len(views[0]):
+                    sent_size -= len(views[0])
+                    views.pop(0)
+
+                if sent_size > 0:
+                    views[0] = views[0][sent_size:]
         except socket.error:
             raise StreamWriteException('Writing to stream failed. Probably client disconnected.')
 
+    def splice_chunk(self, target: 'Stream', pipe: Tuple[int, int]) -> None:
+        """
+        Move available bytes from this stream's socket to the target socket through the pipe without copying them
+        to user space. Only available on Linux, see os.splice(). Restored bytes are not considered.
+
+        :param target: Target stream
+        :param pipe: (read_fd, write_fd) of an empty pipe.
+        :return: None
+        """
+
+        pipe_read, pipe_write = pipe
+
+        # Buffered bytes of the target must be sent before the spliced bytes.
+        target.flush()
+
+        try:
+            size = os.splice(self.sock.fileno(), pipe_write, SPLICE_SIZE)
+        except OSError:
+            raise StreamReadException('Splicing from stream failed. Probably client disconnected.')
+
+        if size == 0:
+            raise StreamReadException('Stream is empty. Probably client disconnected.')
+
+        # Drain the pipe completely so it can be reused for the next chunk.
+        try:
+            while size > 0:
+                size -= os.splice(pipe_read, target.sock.fileno(), size)
+        except OSError:
+            raise StreamWriteException('Splicing to stream failed. Probably client disconnected.')
+
     def restore_bytes(self, data: bytes = None) -> None:
         """
         Use for restoring misread bytes back to the stream.
         :param data: bytes
         :return: None
         """
-        self.restored_bytes += data
+
+        if data:
+            self.restored_bytes.append(data)
 
     def close(self) -> None:
         """
-        Closes inner socket. If already closed, fails silently.
+        Sends buffered bytes and closes inner socket. If already closed, fails silently.
         :return:
         """
 
+        try:
+            self.flush()
+        except StreamWriteException:
+            pass
+
         try:
             self.sock.close()
         except socket.error:
@@ -102,27 +265,34 @@ def read_headers(stream: Stream) -> bytes:
     :return: bytes
     """
 
-    HEADER_END_BYTES = b'\r\n\r\n'
-    buffer = b''
+    # Headers usually arrive in the first chunk. Search it directly without copying it in a buffer.
+    data = stream.read_chunk()
+    matched_index = data.find(HEADER_END_BYTES)
 
-    # Keep reading headers in the buffer until double CRLF are found.
-    # No header size limit is set. Might fill up RAM :/
-    while True:
-        buffer += stream.read_chunk()
+    if matched_index == -1:
+        buffer = bytearray(data)
 
-        # Fill up buffer until there is data to compare with HEADER_END_BYTES.
-        if len(buffer) < len(HEADER_END_BYTES):
-            continue
+        # Keep reading headers in the buffer until double CRLF are found.
+        while matched_index == -1:
+            # Only scan new bytes, keeping overlap of len(HEADER_END_BYTES) - 1 bytes in case double CRLF is split
+            # between chunks. Total scanning work stays linear in header size.
+            scan_from = max(0, len(buffer) - len(HEADER_END_BYTES) + 1)
+            buffer.extend(stream.read_chunk())
+            matched_index = buffer.find(HEADER_END_BYTES, scan_from)
+
+            # Double CRLF found later than this can not end headers within the limit.
+            if matched_index == -1 and len(buffer) - len(HEADER_END_BYTES) + 1 > MAX_HEADER_SIZE:
+                raise StreamReadException(f'Headers exceeded {MAX_HEADER_SIZE} bytes.')
+
+        data = bytes(buffer)
 
-        matched_index = buffer.find(HEADER_END_BYTES)
-        if matched_index != -1:
-            header_bytes = buffer[:matched_index]
+    if matched_index > MAX_HEADER_SIZE:
+        raise StreamReadException(f'Headers exceeded {MAX_HEADER_SIZE} bytes.')
 
-            # Stream might have read bytes from the body too. So, restore back in the stream.
-            # Also skip HEADER_END_BYTES
-            misread_bytes = buffer[matched_index + len(HEADER_END_BYTES):]
-            stream.restore_bytes(misread_bytes)
-            return header_bytes
+    # Stream might have read bytes from the body too. So, restore back in the stream.
+    # Also skip HEADER_END_BYTES
+    stream.restore_bytes(data[matched_index + len(HEADER_END_BYTES):])
+    return data[:matched_index]
 
 
 def extract_http_starting_header_info(line: str) -> Optional[Tuple[str, str, str]]:
@@ -132,17 +302,19 @@ def extract_http_starting_header_info(line: str) -> Optional[Tuple[str, str, str
     :return: Optional (request_method, request_path, http_version)
     """
 
-    values = line.split(' ')
-    if len(values) >= 3:
-        request_method = values[0]
-        request_path = ' '.join(values[1:-1])
-        http_version = values[-1]
-        return request_method, request_path, http_version
+    # Path might contain spaces, so only split at the first and the last space.
+    request_method, separator, rest = line.partition(' ')
+    if not separator:
+        return None
 
-    return None
+    request_path, separator, http_version = rest.rpartition(' ')
+    if not separator:
+        return None
+
+    return request_method, request_path, http_version
 
 
-def parse_headers(data: bytes) -> Tuple[Optional[Tuple[str, str, str]], OrderedDict[str, List[str]]]:
+def parse_headers(data: bytes) -> Tuple[Optional[Tuple[str, str, str]], Headers]:
     """
     Parse raw header bytes and return the result.
 
@@ -150,21 +322,26 @@ def parse_headers(data: bytes) -> Tuple[Optional[Tuple[str, str, str]], OrderedD
     :return: request_method, path, http_version
     """
 
-    headers = OrderedDict()
-    header_lines = data.decode(errors='ignore').split('\r\n')
+    headers = {}
+    # Headers are ISO-8859-1. Decoding as latin-1 never fails and the bytes round trip unchanged when encoded back.
+    header_lines = data.decode('latin-1').split('\r\n')
+
+    # First line is the request or status line, it is never a header even if it contains colon.
+    for header_line in header_lines[1:]:
+        raw_key, separator, raw_value = header_line.partition(':')
 
-    for header_line in header_lines:
         # Simply ignore invalid header.
-        if header_line.find(":") == -1:
+        if not separator:
             continue
 
-        raw_key, raw_value = header_line.split(':', 1)
         key, value = raw_key.strip(), raw_value.strip()
+        lower_key = key.lower()
 
-        if headers.get(key):
-            headers[key].append(value)
+        header = headers.get(lower_key)
+        if header is None:
+            headers[lower_key] = (key, [value])
         else:
-            headers[key] = [value]
+            header[1].append(value)
 
     request_info = None
     if len(header_lines) > 0:
@@ -173,7 +350,7 @@ def parse_headers(data: bytes) -> Tuple[Optional[Tuple[str, str, str]], OrderedD
     return request_info, headers
 
 
-def header_value(headers: OrderedDict[str, List[str]], name: str) -> Optional[str]:
+def header_value(headers: Headers, name: str) -> Optional[str]:
     """
     Header can have multiple values with same name. Extract only first found value.
     :param headers: Headers
@@ -181,16 +358,14 @@ def header_value(headers: OrderedDict[str, List[str]], name: str) -> Optional[st
     :return: Header value
     """
 
-    for header in headers.keys():
-        if header.lower() == name.lower():
-            values = headers[header]
-            if len(values) > 0:
-                return values[0]
+    header = headers.get(name.lower())
+    if header and len(header[1]) > 0:
+        return header[1][0]
 
     return None
 
 
-def modify_headers(headers: OrderedDict[str, List[str]], name: str, value: str) -> None:
+def modify_headers(headers: Headers, name: str, value: str) -> None:
     """
     Modify the provided header dictionary object. If the header is not present, adds new header with the given name and value.
 
@@ -200,18 +375,11 @@ def modify_headers(headers: OrderedDict[str, List[str]], name: str, value: str)
     :return: None
     """
 
-    is_found = False
-
-    for header in headers.keys():
-        if header.lower() == name.lower():
-            headers[name] = [value]
-            is_found = True
-
-    if not is_found:
-        headers[name] = [value]
+    # Replacing existing header keeps its position.
+    headers[name.lower()] = (name, [value])
 
 
-def build_header_bytes(request_info: Tuple[str, str, str], headers: OrderedDict[str, List[str]]) -> bytes:
+def build_header_bytes(request_info: Tuple[str, str, str], headers: Headers) -> bytes:
     """
     Create the header bytes from the request info and headers.
 
@@ -220,24 +388,28 @@ def build_header_bytes(request_info: Tuple[str, str, str], headers: OrderedDict[
     :return: bytes
     """
 
-    data = f'{request_info[0]} {request_info[1]} {request_info[2]}\r\n'.encode(errors='ignore')
+    # Collect all parts and join once instead of concatenating bytes for each header.
+    parts = [request_info[0], ' ', request_info[1], ' ', request_info[2], '\r\n']
 
-    for key, values in headers.items():
+    for key, values in headers.values():
         for value in values:
-            data += f'{key}: {value}\r\n'.encode(errors='ignore')
+            parts.append(key)
+            parts.append(': ')
+            parts.append(value)
+            parts.append('\r\n')
 
-    data += b'\r\n'
-    return data
+    parts.append('\r\n')
+    return ''.join(parts).encode('latin-1', errors='ignore')
 
 
-def read_text_body(headers: OrderedDict[str, List[str]], stream: Stream) -> str:
+def read_body(headers: Headers, stream: Stream) -> bytearray:
     """
-    Read text body from stream as str. If content length header is present, read content upto the size else
+    Read raw body from stream. If content length header is present, read content upto the size else
     read until the target closes socket.
 
     :param headers: Headers
     :param stream: Stream
-    :return: response body
+    :return: response body bytes
     """
 
     content_length = header_value(headers, 'Content-Length')
@@ -248,21 +420,25 @@ def read_text_body(headers: OrderedDict[str, List[str]], stream: Stream) -> str:
         except ValueError:
             content_length = None
 
-    buffer = b''
+    # Negative length is as invalid as unparsable one.
+    if content_length is not None and content_length < 0:
+        content_length = None
 
     if content_length is not None:
+        # Body size is known, read directly into a buffer of the final size.
+        buffer = bytearray(content_length)
+        view = memoryview(buffer)
         read_size = 0
         while read_size < content_length:
-            chunk = stream.read_chunk()
-            buffer += chunk
-            read_size += len(chunk)
-
-    else:
-        while True:
-            try:
-                buffer += stream.read_chunk()
-            except StreamReadException:
-                break
-
-    decoded = buffer.decode(errors='ignore')
-    return decoded
+            read_size += stream.read_into(view[read_size:])
+
+        return buffer
+
+    buffer = bytearray()
+    while True:
+        try:
+            buffer.extend(stream.read_chunk())
+        except StreamReadException:
+            break
+
+    return buffer
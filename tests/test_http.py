@@ -1,3 +1,5 @@
+import socket
+import threading
 import unittest
 
 from src.django_quik.server import http
@@ -8,12 +10,152 @@ class TestHttp(unittest.TestCase):
     More tests later :/
     """
 
+    def setUp(self):
+        self.sock, self.peer = socket.socketpair()
+        self.stream = http.Stream(self.sock)
+
+    def tearDown(self):
+        self.stream.close()
+        self.peer.close()
+
     def test_extract_http_starting_header_info(self):
         request_method, path, http_version = http.extract_http_starting_header_info('GET / HTTP/1.0')
         self.assertEqual(request_method, 'GET')
         self.assertEqual(path, '/')
         self.assertEqual(http_version, 'HTTP/1.0')
 
+        self.assertEqual(
+            http.extract_http_starting_header_info('HTTP/1.0 404 Not Found'),
+            ('HTTP/1.0', '404 Not', 'Found')
+        )
+        self.assertIsNone(http.extract_http_starting_header_info('GET /'))
+
+    def test_parse_headers(self):
+        request_info, headers = http.parse_headers(
+            b'GET http://localhost:8000/ HTTP/1.1\r\nHost: localhost:8000\r\nAccept: a\r\nAccept: b\r\ninvalid'
+        )
+        self.assertEqual(request_info, ('GET', 'http://localhost:8000/', 'HTTP/1.1'))
+        self.assertEqual(
+            list(headers.items()),
+            [('host', ('Host', ['localhost:8000'])), ('accept', ('Accept', ['a', 'b']))]
+        )
+        self.assertEqual(http.header_value(headers, 'ACCEPT'), 'a')
+
+    def test_headers_round_trip_non_ascii_bytes(self):
+        raw_headers = b'GET /caf\xc3\xa9/\xff HTTP/1.0\r\nX-Name: \xe9t\xe9'
+        request_info, headers = http.parse_headers(raw_headers)
+        self.assertEqual(http.build_header_bytes(request_info, headers), raw_headers + b'\r\n\r\n')
+
+    def test_modify_headers(self):
+        _, headers = http.parse_headers(b'HTTP/1.1 200 OK\r\ncontent-length: 10\r\nContent-Type: text/html')
+        http.modify_headers(headers, 'Content-Length', '20')
+        http.modify_headers(headers, 'Connection', 'Close')
+
+        self.assertEqual(
+            http.build_header_bytes(('HTTP/1.0', '200', 'OK'), headers),
+            b'HTTP/1.0 200 OK\r\nContent-Length: 20\r\nContent-Type: text/html\r\nConnection: Close\r\n\r\n'
+        )
+
+    def test_read_body(self):
+        _, headers = http.parse_headers(b'HTTP/1.0 200 OK\r\nContent-Length: 6')
+        self.stream.restore_bytes(b'ab')
+        self.peer.sendall(b'cdefgh')
+
+        self.assertEqual(http.read_body(headers, self.stream), b'abcdef')
+        self.assertEqual(self.stream.read_chunk(), b'gh')
+
+    def test_read_headers_single_chunk(self):
+        self.peer.sendall(b'GET / HTTP/1.0\r\nHost: a\r\n\r\nbody')
+        self.assertEqual(http.read_headers(self.stream), b'GET / HTTP/1.0\r\nHost: a')
+        self.assertEqual(self.stream.read_chunk(), b'body')
+
+    def test_read_body_negative_content_length(self):
+        _, headers = http.parse_headers(b'HTTP/1.0 200 OK\r\nContent-Length: -1')
+        self.peer.sendall(b'body')
+        self.peer.close()
+
+        self.assertEqual(http.read_body(headers, self.stream), b'body')
+
+    def test_read_headers_split_between_chunks(self):
+        self.stream.buffer_size = 5
+        self.peer.sendall(b'GET / HTTP/1.0\r\nHost: a\r\n\r\nbody')
+        self.assertEqual(http.read_headers(self.stream), b'GET / HTTP/1.0\r\nHost: a')
+        self.assertEqual(self.stream.read_chunk(), b'bod')
+
+    def test_read_headers_size_limit(self):
+        self.stream.buffer_size = 4096
+
+        # Never ending header without double CRLF.
+        self.stream.restore_bytes(b'GET / HTTP/1.0\r\nX: ' + b'a' * (http.MAX_HEADER_SIZE - 4096))
+        self.peer.sendall(b'a' * 8192)
+        self.assertRaises(http.StreamReadException, http.read_headers, self.stream)
+
+    def test_read_headers_size_limit_boundary(self):
+        self.stream.buffer_size = 4096
+        request_line = b'GET / HTTP/1.0\r\nX: '
+
+        # Headers of exactly MAX_HEADER_SIZE bytes are accepted.
+        headers = request_line + b'a' * (http.MAX_HEADER_SIZE - len(request_line))
+        self.stream.restore_bytes(headers)
+        self.peer.sendall(b'\r\n\r\nbody')
+        self.assertEqual(http.read_headers(self.stream), headers)
+        self.assertEqual(self.stream.read_chunk(), b'body')
+
+        # One byte over the limit is rejected, even when the last chunk also carries double CRLF.
+        self.stream.restore_bytes(headers[:-100])
+        self.peer.sendall(headers[-100:] + b'a\r\n\r\nbody')
+        self.assertRaises(http.StreamReadException, http.read_headers, self.stream)
+
+    def test_stream_read_chunk_returns_restored_bytes(self):
+        data = b'restored body'
+        self.stream.restore_bytes(data)
+        self.assertIs(self.stream.read_chunk(), data)
+        self.assertFalse(self.stream.restored_bytes)
+
+    def test_stream_restore_bytes_order(self):
+        self.stream.restore_bytes(b'first')
+        self.stream.restore_bytes(b'second')
+        self.peer.sendall(b'third')
+
+        self.assertEqual(self.stream.read_chunk(), b'first')
+        self.assertEqual(self.stream.read_chunk(), b'second')
+        self.assertEqual(self.stream.read_chunk(), b'third')
+
+    def test_stream_read_into(self):
+        self.stream.restore_bytes(b'abc')
+        self.peer.sendall(b'def')
+
+        buffer = memoryview(bytearray(2))
+        self.assertEqual(self.stream.read_into(buffer), 2)
+        self.assertEqual(bytes(buffer), b'ab')
+        self.assertEqual(self.stream.read_into(buffer), 1)
+        self.assertEqual(bytes(buffer[:1]), b'c')
+        self.assertEqual(self.stream.read_into(buffer), 2)
+        self.assertEqual(bytes(buffer), b'de')
+
+    def test_stream_buffer_chunk(self):
+        self.stream.buffer_chunk(b'head')
+        self.stream.buffer_chunk(b'er')
+        self.peer.setblocking(False)
+        self.assertRaises(BlockingIOError, self.peer.recv, 1024)
+
+        self.stream.write_chunk(b'body')
+        self.peer.setblocking(True)
+        self.assertEqual(self.peer.recv(1024), b'headerbody')
+        self.assertFalse(self.stream.pending_bytes)
+
+    def test_stream_write_chunks(self):
+        body = b'b' * 1000000
+        thread = threading.Thread(target=self.stream.write_chunks, args=((b'head', b'', bytearray(body)),))
+        thread.start()
+
+        received = bytearray()
+        while len(received) < len(body) + 4:
+            received.extend(self.peer.recv(65536))
+
+        thread.join()
+        self.assertEqual(received, b'head' + body)
+
 
 if __name__ == '__main__':
     unittest.main()
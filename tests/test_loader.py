@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from src.django_quik import loader
+
+
+class TestLoader(unittest.TestCase):
+    def test_parse_settings_module_path(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manage_py_path = os.path.join(temp_dir, 'manage.py')
+            with open(manage_py_path, 'w') as file:
+                file.write("os.environ.setdefault(\n    'DJANGO_SETTINGS_MODULE', \"mysite.settings\"\n)\n")
+
+            manage_py = SimpleNamespace(__file__=manage_py_path)
+            self.assertEqual(loader.parse_settings_module_path(manage_py), 'mysite.settings')
+
+            with open(manage_py_path, 'w') as file:
+                file.write('def main():\n    pass\n')
+
+            self.assertIsNone(loader.parse_settings_module_path(manage_py))
+
+        self.assertIsNone(loader.parse_settings_module_path(SimpleNamespace()))
+        self.assertIsNone(loader.parse_settings_module_path(SimpleNamespace(__file__=manage_py_path)))
+
+    def test_parse_settings_module_path_skips_commented_lines(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manage_py_path = os.path.join(temp_dir, 'manage.py')
+            with open(manage_py_path, 'w') as file:
+                file.write("# os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'old.settings')\n"
+                           "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')\n")
+
+            manage_py = SimpleNamespace(__file__=manage_py_path)
+            self.assertEqual(loader.parse_settings_module_path(manage_py), 'mysite.settings')
+
+    def test_parse_settings_module_path_multiple_candidates(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manage_py_path = os.path.join(temp_dir, 'manage.py')
+            with open(manage_py_path, 'w') as file:
+                file.write("if sys.argv[1] == 'test':\n"
+                           "    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.test_settings')\n"
+                           "else:\n"
+                           "    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')\n")
+
+            manage_py = SimpleNamespace(__file__=manage_py_path)
+            self.assertIsNone(loader.parse_settings_module_path(manage_py))
+
+    def test_is_project_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project_dir = os.path.realpath(temp_dir)
+
+            self.assertTrue(loader.is_project_dir(project_dir, project_dir))
+            self.assertTrue(loader.is_project_dir(os.path.join(project_dir, 'templates'), project_dir))
+            self.assertFalse(loader.is_project_dir(os.path.dirname(project_dir), project_dir))
+            self.assertFalse(loader.is_project_dir(project_dir + '-other', project_dir))
+
+            for excluded_name in loader.EXCLUDED_WATCH_DIR_NAMES:
+                excluded_dir = os.path.join(project_dir, excluded_name, 'app', 'templates')
+                self.assertFalse(loader.is_project_dir(excluded_dir, project_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from watchdog.events import DirModifiedEvent, FileModifiedEvent, FileMovedEvent
+
+from src.django_quik.config import Configuration
+from src.django_quik.server import (
+    BODY_END_SEARCH_SIZE, IDLE_CLIENT_WORKERS, FilesWatchEventHandler, ThreadSafeChangeCallbacks, WebServer
+)
+
+
+class DjangoServerHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'<html><body>Hello</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestWebServer(unittest.TestCase):
+    def setUp(self):
+        self.django_server = ThreadingHTTPServer(('127.0.0.1', 0), DjangoServerHandler)
+        threading.Thread(target=self.django_server.serve_forever, daemon=True).start()
+
+        self.configuration = Configuration(
+            host='127.0.0.1',
+            port=free_port(),
+            proxy_port=self.django_server.server_address[1],
+            watch_dirs=[]
+        )
+        self.web_server = WebServer(self.configuration)
+        threading.Thread(target=self.web_server.listen, daemon=True).start()
+
+        # Wait until the proxy server starts listening.
+        for _ in range(50):
+            try:
+                self.connect().close()
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.1)
+
+    def tearDown(self):
+        self.django_server.shutdown()
+        self.django_server.server_close()
+
+    def connect(self) -> socket.socket:
+        return socket.create_connection((self.configuration.host, self.configuration.port), timeout=5)
+
+    def test_idle_connections_do_not_block_requests(self):
+        # Connections which never send headers keep their workers busy.
+        idle_clients = [self.connect() for _ in range(IDLE_CLIENT_WORKERS + 2)]
+
+        try:
+            with self.connect() as client:
+                client.sendall(b'GET / HTTP/1.0\r\nHost: localhost\r\n\r\n')
+
+                response = b''
+                while True:
+                    chunk = client.recv(65536)
+                    if not chunk:
+                        break
+
+                    response += chunk
+
+            self.assertTrue(response.startswith(b'HTTP/1.0 200'))
+            self.assertIn(self.web_server.injected_code_bytes + b'</body>', response)
+        finally:
+            for idle_client in idle_clients:
+                idle_client.close()
+
+
+class TestInjectEventCode(unittest.TestCase):
+    def setUp(self):
+        self.web_server = WebServer(Configuration(host='127.0.0.1', port=0, proxy_port=0, watch_dirs=[]))
+        self.script = self.web_server.injected_code_bytes
+
+    def test_inject_before_last_body_end_tag(self):
+        html = b'<body><script>"</body>"</script></BODY></html>'
+        self.assertEqual(
+            self.web_server.inject_event_code(html),
+            b'<body><script>"</body>"</script>' + self.script + b'</BODY></html>'
+        )
+
+    def test_inject_before_body_end_tag_with_whitespace(self):
+        html = b'<body>Hello</body >'
+        self.assertEqual(self.web_server.inject_event_code(html), b'<body>Hello' + self.script + b'</body >')
+
+    def test_no_body_end_tag(self):
+        html = b'<div>Partial page</div>'
+        self.assertEqual(self.web_server.inject_event_code(html), html)
+
+    def test_inject_before_body_end_tag_far_from_page_end(self):
+        trailer = b'<!--' + b'a' * BODY_END_SEARCH_SIZE + b'-->'
+        html = b'<body>Hello</body>' + trailer
+        self.assertEqual(self.web_server.inject_event_code(html), b'<body>Hello' + self.script + b'</body>' + trailer)
+
+        # Body end tag crossing the start of the searched tail.
+        html = b'<body>Hello</body>' + b'a' * (BODY_END_SEARCH_SIZE - 3)
+        self.assertEqual(
+            self.web_server.inject_event_code(html),
+            b'<body>Hello' + self.script + b'</body>' + b'a' * (BODY_END_SEARCH_SIZE - 3)
+        )
+
+
+class TestFilesWatchEventHandler(unittest.TestCase):
+    def setUp(self):
+        configuration = Configuration(host='127.0.0.1', port=0, proxy_port=0, watch_dirs=[])
+        self.handler = FilesWatchEventHandler(ThreadSafeChangeCallbacks(configuration), delay=60)
+
+    def tearDown(self):
+        if self.handler.timer:
+            self.handler.timer.cancel()
+
+    def test_file_modified_arms_timer(self):
+        self.handler.dispatch(FileModifiedEvent('a.html'))
+        self.assertIsNotNone(self.handler.timer)
+
+    def test_temporary_file_moved_to_real_path_arms_timer(self):
+        self.handler.dispatch(FileMovedEvent('a.html~', 'a.html'))
+        self.assertIsNotNone(self.handler.timer)
+
+    def test_swap_file_modified_is_ignored(self):
+        self.handler.dispatch(FileModifiedEvent('a.swp'))
+        self.assertIsNone(self.handler.timer)
+
+    def test_dir_modified_is_ignored(self):
+        self.handler.dispatch(DirModifiedEvent('d'))
+        self.assertIsNone(self.handler.timer)
+
+if __name__ == '__main__':
+    unittest.main()